@@ -1,131 +1,237 @@
-from flask import Flask, render_template, request, jsonify
-from formulas.wheeler_1965 import Wheeler_1965
-from formulas.hammerstad_1975 import Hammerstad1975
-from formulas.Wheeler_1977 import Wheeler_1977
-from formulas.hammerstad import HammerstadJensen
-from formulas.schneider import SchneiderMicrostrip
-from formulas.IPC2141 import IPC2141Microstrip
+import functools
+
+import numpy as np
+from flask import Flask, g, render_template, request, jsonify
+from formulas import registry
+from formulas.incremental import AnalysisSession
+from flask_sock import Sock
+import jobs
+from live import LiveSession
+from profiling import RequestProfiler
 app = Flask(__name__)
+sock = Sock(app)
+# e.g. MICROSTRIP_PROFILE_THRESHOLD_MS=500 MICROSTRIP_PROFILE_TOKEN='"secret"'
+app.config.from_prefixed_env("MICROSTRIP")
+profiler = RequestProfiler(app)
 
 @app.route("/", methods=["GET", "POST"])
 def index():
     return render_template("index2.html")
 
+def _substrate(data):
+    """Substrate params in SI units from a request payload in mm / GHz."""
+    substrate = {"er": data.get("er"), "freq": data.get("freq")}
+    if data.get("h") is not None:
+        substrate["h"] = data.get("h") / 1000.0
+    if data.get("t") is not None:
+        substrate["t"] = data.get("t") / 1000.0
+    return substrate
+
+
+def _with_warnings(result, data, w_m):
+    """Add a "warnings" list when the design is outside the model's published validity range."""
+    warnings = registry.get_spec(data.get("formula")).warnings(_substrate(data), w_m)
+    if warnings:
+        result["warnings"] = warnings
+    return result
+
+
+def _synthesize(data):
+    """Run one synthesis from a request payload; returns (body, status)."""
+    try:
+        w_m, l_m = registry.synthesize(data.get("formula"), _substrate(data),
+                                       data.get("zo"), data.get("elecLen"))
+    except (ValueError, TypeError) as e:
+        return {"error": str(e)}, 400
+
+    result = {"width_mm": w_m * 1000}
+    if l_m is not None:
+        result["length_mm"] = l_m * 1000
+    return _with_warnings(result, data, w_m), 200
+
+def _analyze(data, session=None):
+    """
+    Run one analysis from a request payload; returns (body, status).
+    A formulas.incremental.AnalysisSession reuses er_eff/Z0 from the
+    previous call when only freq or length changed.
+    """
+    if data.get("width_mm") is None:
+        return {"error": "A width (width_mm) is required."}, 400
+    try:
+        w = float(data.get("width_mm")) / 1000.0
+        l = None
+        if data.get("length_mm") is not None:
+            l = float(data.get("length_mm")) / 1000.0
+        analyze_fn = session.analyze if session is not None else registry.analyze
+        zo, elecLen = analyze_fn(data.get("formula"), _substrate(data), w, l)
+    except (ValueError, TypeError) as e:
+        return {"error": str(e)}, 400
+
+    result = {"zo": zo}
+    if elecLen is not None:
+        result["elecLen"] = elecLen
+    return _with_warnings(result, data, w), 200
+
 @app.route("/synthesize", methods=["POST"])
 def synthesize():
-    data = request.get_json()
-    er = data.get("er")
-    h_mm = data.get("h")           
-    formula = data.get("formula")
-    zo = data.get("zo")
-    elecLen = data.get("elecLen")
-    freq = data.get("freq")
-    t_mm = data.get("t")
-
-    h = h_mm / 1000.0  
-    if t_mm is not None:
-        t = t_mm / 1000.0  
-    width_mm = None
-    length_mm = None
-
-    if formula == "Wheeler 1965":
-        ob = Wheeler_1965(er, h, freq)
-        w_m, l_m = ob.Synthesize(zo, elecLen)
-        width_mm, length_mm = w_m * 1000, l_m * 1000
-    elif formula == "Hammerstad and Jensen":
-        ob = HammerstadJensen(er, h, freq)
-        w_m, l_m = ob.synthesize(zo, elecLen)
-        width_mm, length_mm = w_m * 1000, l_m * 1000
-    elif formula == "Wheeler 1977":
-        ob = Wheeler_1977(er, h, freq)
-        w_m, l_m = ob.Synthesize(zo, elecLen)
-        width_mm, length_mm = w_m * 1000, l_m * 1000
-    elif formula == "Hammerstad 1975":
-        ob = Hammerstad1975(er, h, freq)
-        w_m, l_m = ob.synthesize(zo, elecLen)
-        width_mm, length_mm = w_m * 1000, l_m * 1000
-    elif formula == "Schneider":
-        ob = SchneiderMicrostrip(er, h, freq)
-        w_m, l_m = ob.synthesize(zo, elecLen)
-        width_mm, length_mm = w_m * 1000, l_m * 1000
-    elif formula == "IPC2141":
-        # Check if t was provided, which IPC requires
-        if t is None:
-             return jsonify({"error": "IPC2141 formula requires a thickness (t)."}), 400
-        print("IPC2141")
-        ob = IPC2141Microstrip(er, h, t) # <<<--- 3. Now 't' is in meters
-        width_mm = ob.synthesize(zo) * 1000
-        
-    if formula == "IPC2141":
-        result = {
-            "width_mm": width_mm
-        }
-    else:
-        result = {
-            "width_mm": width_mm,
-            "length_mm": length_mm
-        }
-    return jsonify(result)
+    body, status = _synthesize(request.get_json())
+    return jsonify(body), status
 
 @app.route("/analyze", methods=["POST"])
 def analyze():
+    body, status = _analyze(request.get_json())
+    return jsonify(body), status
+
+def _live_compute(session, params):
+    if params.get("mode") == "analyze":
+        return _analyze(params, session)
+    return _synthesize(params)
+
+@sock.route("/live")
+def live(ws):
+    """
+    WebSocket for the interactive UI. Clients send partial payloads (the
+    /analyze or /synthesize fields plus "mode" and an optional "seq");
+    the server merges them into the session state and pushes the result
+    for the latest state only.
+
+    Each open socket holds a server thread for its whole lifetime, so
+    under gunicorn run threaded workers, e.g.
+    gunicorn -w 2 --threads 16 app:app; sync workers without --threads
+    block on the first live connection.
+    """
+    LiveSession(ws, functools.partial(_live_compute, AnalysisSession())).run()
+
+def _batch_items(mode, payloads):
+    """Registry items (SI units) from /analyze or /synthesize style payloads."""
+    if mode not in ("analyze", "synthesize"):
+        raise ValueError("mode must be 'analyze' or 'synthesize'.")
+    items = []
+    for i, d in enumerate(payloads):
+        item = _substrate(d)
+        item["formula"] = d.get("formula")
+        spec = registry.get_spec(item["formula"])
+        spec.substrate_key(item)
+        if mode == "analyze":
+            item["w"] = float(d.get("width_mm")) / 1000.0
+            if d.get("length_mm") is not None:
+                item["l"] = float(d.get("length_mm")) / 1000.0
+            try:
+                spec.check_dimensions(item["w"], item.get("l"))
+            except ValueError as e:
+                raise ValueError(f"Item {i}: {e}")
+        else:
+            item["zo"], item["elecLen"] = d.get("zo"), d.get("elecLen")
+        items.append(item)
+    return items
+
+def _batch_results(mode, results):
+    """Response bodies (mm units) for registry batch results."""
+    if mode == "analyze":
+        return [{"zo": z} if t is None else {"zo": z, "elecLen": t} for z, t in results]
+    return [{"width_mm": w * 1000} if l is None else {"width_mm": w * 1000, "length_mm": l * 1000}
+            for w, l in results]
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    """
+    {"mode": "analyze" | "synthesize", "items": [<payload>, ...]} with the
+    same per-item fields as /analyze and /synthesize. Items sharing a
+    formula and substrate are evaluated together.
+    """
     data = request.get_json()
-    er = data.get("er")
-    h_mm = data.get("h")  # in mm from frontend
-    formula = data.get("formula")
-    width_mm = data.get("width_mm")
-    length_mm = data.get("length_mm")
-    t = None
+    mode = data.get("mode")
     try:
-        freq = data.get("freq")
-    except:
-        pass
+        items = _batch_items(mode, data.get("items", []))
+        if mode == "analyze":
+            results = registry.analyze_batch(items)
+        else:
+            results = registry.synthesize_batch(items)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"results": _batch_results(mode, results)})
+
+def _job_size(n):
+    """Check an item count (or list) against jobs.MAX_ITEMS and return it."""
+    count = n if isinstance(n, int) else len(n)
+    if not 1 <= count <= jobs.MAX_ITEMS:
+        raise ValueError(f"A job needs between 1 and {jobs.MAX_ITEMS} items.")
+    return n
+
+def _job_payloads(data):
+    """
+    Expand a job request into per-item payloads. One of:
+      "items":     [<payload>, ...]
+      "sweep":     {"base": <payload>, "param": "width_mm",
+                    "values": [...] or "start"/"stop"/"points"}
+      "tolerance": {"base": <payload>, "sigma": {"er": 0.05, ...},
+                    "samples": 1000, "seed": 0}  (Gaussian, absolute sigma)
+    At most jobs.MAX_ITEMS payloads; larger requests are refused before
+    anything is expanded.
+    """
+    if "items" in data:
+        return _job_size(data["items"])
+    if "sweep" in data:
+        sw = data["sweep"]
+        values = sw.get("values")
+        if values is None:
+            values = np.linspace(sw["start"], sw["stop"], _job_size(int(sw["points"]))).tolist()
+        return [dict(sw["base"], **{sw["param"]: v}) for v in _job_size(values)]
+    if "tolerance" in data:
+        tol = data["tolerance"]
+        rng = np.random.default_rng(tol.get("seed"))
+        n = _job_size(int(tol["samples"]))
+        draws = {k: rng.normal(tol["base"][k], sigma, n).tolist() for k, sigma in tol["sigma"].items()}
+        return [dict(tol["base"], **{k: v[i] for k, v in draws.items()}) for i in range(n)]
+    raise ValueError("Job needs 'items', 'sweep' or 'tolerance'.")
+
+def _jobs_db():
+    if "jobs_db" not in g:
+        g.jobs_db = jobs.connect(app.config.get("JOBS_DB", jobs.DEFAULT_DB))
+    return g.jobs_db
+
+@app.teardown_appcontext
+def _close_jobs_db(exc=None):
+    db = g.pop("jobs_db", None)
+    if db is not None:
+        db.close()
+
+@app.route("/jobs", methods=["POST"])
+def job_submit():
+    """Queue a background job (see _job_payloads); workers run via jobs.py."""
+    data = request.get_json()
+    mode = data.get("mode")
     try:
-        t_mm = data.get("t") # <<<--- 2. Get t in mm
-        if t_mm is not None:
-             t = t_mm / 1000.0 # <<<--- 3. Convert t from mm to METERS
-    except:
-        pass
-
-    h = h_mm / 1000.0  # convert mm to meters
-
-    # Convert width and length from mm to meters
-    w = float(width_mm) / 1000.0
-    if(formula != "IPC2141"):
-        
-        l = float(length_mm) / 1000.0
-
-    if formula == "Wheeler 1965":
-        ob = Wheeler_1965(er, h, freq)
-        zo, elecLen = ob.Analyze(w, l)
-    elif formula == "Wheeler 1977":
-        ob = Wheeler_1977(er, h, freq)
-        zo, elecLen = ob.Analyze(w, l)
-    elif formula == "Hammerstad 1975":
-        ob = Hammerstad1975(er, h, freq)
-        zo, elecLen = ob.analyze(w, l)
-    elif formula == "Hammerstad and Jensen":
-        ob = HammerstadJensen(er, h, freq)
-        zo, elecLen = ob.analyze(w, l)
-    elif formula == "Schneider":
-        ob = SchneiderMicrostrip(er, h, freq)
-        zo, elecLen = ob.analyze(w, l)
-    elif formula == "IPC2141":
-        # Check if t was provided
-        if t is None:
-            return jsonify({"error": "IPC2141 formula requires a thickness (t)."}), 400
-        ob = IPC2141Microstrip(er, h, t) # <<<--- 4. Now 't' is in meters
-        zo = ob.analyze(w)
-
-    
-    if formula == "IPC2141":
-        return jsonify({"zo": zo}) # <<<--- This was correct
-        
-    result = {
-        "zo": zo,
-        "elecLen": elecLen
-    }
-    return jsonify(result)
+        items = _batch_items(mode, _job_payloads(data))
+        job_id = jobs.submit(_jobs_db(), mode, items, int(data.get("chunk_size", jobs.CHUNK_SIZE)))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(jobs.status(_jobs_db(), job_id)), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.status(_jobs_db(), job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job)
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id):
+    job = jobs.cancel(_jobs_db(), job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job)
+
+@app.route("/jobs/<job_id>/results/<int:chunk>", methods=["GET"])
+def job_results(job_id, chunk):
+    job = jobs.status(_jobs_db(), job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    results = jobs.chunk_results(_jobs_db(), job_id, chunk)
+    if results is None:
+        return jsonify({"error": f"Chunk {chunk} is not ready.", "status": job["status"]}), 404
+    return jsonify({"chunk": chunk, "chunks": job["chunks"],
+                    "results": _batch_results(job["mode"], results)})
 
 
 if __name__ == "__main__":
@@ -25,6 +25,17 @@ class IPC2141Microstrip:
         # print("-------------------------------IPC2141 Analyze-----------------------------")
         return float(Z0)
 
+    def synthesize_closed_form(self, Z0_target):
+        """
+        Exact inverse of the IPC-2141 equation: width w (m) for target Z0 (Ω).
+        """
+        if Z0_target <= 0:
+            raise ValueError("Target impedance must be > 0")
+        w = ((5.98 * self.h) / math.exp(Z0_target * math.sqrt(self.er + 1.41) / 87.0) - self.t) / 0.8
+        if w <= 0:
+            raise ValueError("Target impedance is too high for this substrate (width would be <= 0).")
+        return float(w)
+
     def synthesize(self, Z0_target, initial_guess_w=None):
         """
         Returns the trace width w (m) for a given target impedance (Ω).
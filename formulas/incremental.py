@@ -0,0 +1,115 @@
+import threading
+
+import numpy as np
+
+from formulas import registry
+from formulas.vectorized import ARRAY_MODELS, eeff_array, theta_array, z0_array
+
+
+def _freeze(x):
+    # Keep a private copy of array inputs so later in-place edits by the
+    # caller cannot make a stale value look current
+    return np.array(x, dtype=float) if isinstance(x, np.ndarray) else x
+
+
+def _same(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.shape(a) == np.shape(b) and np.array_equal(a, b)
+    return a == b
+
+
+class _Node:
+    """One memoized quantity, recomputed only when one of its inputs changes."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.inputs = None
+        self.value = None
+        self.version = 0        # bumped on every recompute; downstream nodes key on it
+        self.evals = 0
+
+    def get(self, *inputs):
+        if self.inputs is not None and all(map(_same, inputs, self.inputs)):
+            return self.value
+        self.value = self.fn(*inputs)
+        self.inputs = tuple(_freeze(x) for x in inputs)
+        self.version += 1
+        self.evals += 1
+        return self.value
+
+
+class IncrementalAnalyzer:
+    """
+    Analyze for one vectorized model class as a dependency graph:
+
+        (er, h, w)        -> er_eff
+        (er, h, w, er_eff) -> Z0
+        er_eff            -> beta (deg per m per Hz)
+        (beta, freq, l)   -> theta
+
+    Each node keeps its last inputs and value, so a call that changes
+    only freq or l costs a couple of multiplies instead of the logs and
+    square roots of er_eff and Z0. Inputs may be scalars or arrays that
+    broadcast together; a freq sweep over fixed widths is best passed as
+    w of shape (N, 1) and freq of shape (F,).
+    """
+
+    def __init__(self, cls):
+        if cls not in ARRAY_MODELS:
+            raise ValueError(f"No array evaluation for {cls.__name__}")
+        self.cls = cls
+        self.lock = threading.Lock()
+        self.eeff = _Node(lambda er, h, w: eeff_array(np.asarray(w, dtype=float) / h, er))
+        self.z0 = _Node(lambda er, h, w, _v: z0_array(
+            cls, np.asarray(w, dtype=float) / h, er, self.eeff.value))
+        self.beta = _Node(lambda _v: theta_array(cls, self.eeff.value, 1.0, 1.0))
+        self.theta = _Node(lambda _v, freq, l: self.beta.value * np.asarray(l, dtype=float) * (freq * 1e9))
+
+    def analyze(self, er, h, freq, w, l):
+        """
+        er (-), h, w, l (m), freq (GHz) -> (Z0 (ohm), electrical length (deg)).
+        The arrays returned are copies; the cached node values stay private.
+        """
+        with self.lock:
+            self.eeff.get(er, h, w)
+            z0 = self.z0.get(er, h, w, self.eeff.version)
+            self.beta.get(self.eeff.version)
+            theta = self.theta.get(self.beta.version, freq, l)
+            return np.array(z0, dtype=float), np.array(theta, dtype=float)
+
+
+class AnalysisSession:
+    """
+    Per-session front end to registry.analyze that keeps one
+    IncrementalAnalyzer per vectorized formula. Models without array
+    evaluation go straight to the registry.
+    """
+
+    def __init__(self):
+        self.analyzers = {}
+
+    def analyze(self, name, substrate, w, l=None):
+        """Same arguments, result and errors as registry.analyze."""
+        spec = registry.get_spec(name)
+        if not registry.is_vectorized(spec):
+            return registry.analyze(name, substrate, w, l)
+        p = dict(zip(spec.params, spec.substrate_key(substrate)))
+        spec.check_dimensions(w, l)
+        analyzer = self.analyzers.get(name)
+        if analyzer is None:
+            analyzer = self.analyzers[name] = IncrementalAnalyzer(spec.cls)
+        z0, theta = analyzer.analyze(p["er"], p["h"], p["freq"], w, l)
+        return float(z0), float(theta)
+
+
+if __name__ == "__main__":
+    # Run from the repository root: python -m formulas.incremental
+    from formulas.hammerstad import HammerstadJensen
+
+    inc = IncrementalAnalyzer(HammerstadJensen)
+    w = np.linspace(0.5e-3, 5e-3, 4)
+    for f in (1.0, 2.4, 5.0):
+        Z0, theta = inc.analyze(4.4, 1.6e-3, f, w, 30e-3)
+        print(f"{f:.1f} GHz: θ = {np.round(theta, 2)}°")
+    print(f"Z0 = {np.round(Z0, 2)} Ω")
+    print(f"er_eff evaluated {inc.eeff.evals}x, Z0 {inc.z0.evals}x, theta {inc.theta.evals}x")
@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+
+from formulas.vectorized import eeff_array, theta_array, z0_array
+
+
+def _segment_params(model, w, l, freqs):
+    """Z0 (ohm) and electrical length (rad) of one segment at each frequency (GHz)."""
+    cls = type(model)
+    U = w / model.h
+    eeff = eeff_array(U, model.er)
+    Z0 = z0_array(cls, U, model.er, eeff)
+    # Only the substrate of the model is used; its own design freq is ignored
+    theta = np.deg2rad(theta_array(cls, eeff, freqs * 1e9, l))
+    return float(Z0), theta
+
+
+def segment_abcd(model, w, l, freqs):
+    """
+    ABCD matrices of one lossless line segment at every frequency.
+    model : formula model instance (its er, h set the substrate)
+    w, l  : width and length (m)
+    freqs : frequencies in GHz, shape (F,)
+    Returns a complex array of shape (F, 2, 2).
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    Z0, theta = _segment_params(model, w, l, freqs)
+    c, s = np.cos(theta), np.sin(theta)
+    out = np.empty(freqs.shape + (2, 2), dtype=complex)
+    out[:, 0, 0] = c
+    out[:, 0, 1] = 1j * Z0 * s
+    out[:, 1, 0] = 1j * s / Z0
+    out[:, 1, 1] = c
+    return out
+
+
+def cascade_abcd(segments, freqs):
+    """
+    Cascade line segments given as (model, w, l) tuples, first to last,
+    and return the overall (F, 2, 2) complex ABCD matrices.
+
+    A cascade of lossless lines keeps A, D real and B, C purely imaginary,
+    so the product is carried as four real arrays (A, B/j, C/j, D) updated
+    for all frequency points at once. This avoids batched complex
+    2x2 matmul and keeps memory at a few (F,) arrays for any segment count.
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    A = np.ones_like(freqs)
+    D = np.ones_like(freqs)
+    b = np.zeros_like(freqs)
+    c = np.zeros_like(freqs)
+    for model, w, l in segments:
+        Z0, theta = _segment_params(model, w, l, freqs)
+        cs, sn = np.cos(theta), np.sin(theta)
+        A, b = A * cs - b * (sn / Z0), A * (Z0 * sn) + b * cs
+        c, D = c * cs + D * (sn / Z0), D * cs - c * (Z0 * sn)
+
+    out = np.empty(freqs.shape + (2, 2), dtype=complex)
+    out[:, 0, 0] = A
+    out[:, 0, 1] = 1j * b
+    out[:, 1, 0] = 1j * c
+    out[:, 1, 1] = D
+    return out
+
+
+def abcd_to_s(abcd, z_ref=50.0):
+    """Convert (F, 2, 2) ABCD matrices to S-parameters with real reference z_ref."""
+    A, B, C, D = abcd[:, 0, 0], abcd[:, 0, 1], abcd[:, 1, 0], abcd[:, 1, 1]
+    Bn, Cn = B / z_ref, C * z_ref
+    den = A + Bn + Cn + D
+    s = np.empty_like(abcd)
+    s[:, 0, 0] = (A + Bn - Cn - D) / den
+    s[:, 0, 1] = 2 * (A * D - B * C) / den
+    s[:, 1, 0] = 2 / den
+    s[:, 1, 1] = (-A + Bn - Cn + D) / den
+    return s
+
+
+def write_touchstone(f, freqs, s, z_ref=50.0, comment=None, chunk=4096):
+    """
+    Write 2-port S-parameters to a Touchstone v1 (.s2p) file.
+    f may be a path or an open text file. Data are written in chunks of
+    `chunk` frequency rows (GHz, real/imaginary), in the order
+    S11 S21 S12 S22 required by the format.
+    """
+    if isinstance(f, (str, os.PathLike)):
+        with open(f, "w") as fh:
+            return write_touchstone(fh, freqs, s, z_ref, comment, chunk)
+
+    freqs = np.asarray(freqs, dtype=float)
+    if comment:
+        for line in str(comment).splitlines():
+            f.write(f"! {line}\n")
+    f.write(f"# GHz S RI R {z_ref:g}\n")
+    order = ((0, 0), (1, 0), (0, 1), (1, 1))
+    for start in range(0, len(freqs), chunk):
+        stop = start + chunk
+        block = s[start:stop]
+        cols = [freqs[start:stop]]
+        for i, j in order:
+            cols.append(block[:, i, j].real)
+            cols.append(block[:, i, j].imag)
+        np.savetxt(f, np.column_stack(cols), fmt="%.9g")
+
+
+if __name__ == "__main__":
+    # Run from the repository root: python -m formulas.network
+    from formulas.hammerstad import HammerstadJensen
+
+    model = HammerstadJensen(er=4.4, h=1.6e-3, freq=2.4)
+    # Alternating 3 mm / 1 mm sections, 6 segments of 5 mm
+    segments = [(model, 3e-3 if k % 2 == 0 else 1e-3, 5e-3) for k in range(6)]
+    freqs = np.linspace(1.0, 10.0, 4)
+    S = abcd_to_s(cascade_abcd(segments, freqs))
+    for f, s in zip(freqs, S):
+        print(f"{f:5.2f} GHz: |S11| = {abs(s[0, 0]):.4f}, |S21| = {abs(s[1, 0]):.4f}")
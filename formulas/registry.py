@@ -0,0 +1,240 @@
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from formulas.wheeler_1965 import Wheeler_1965
+from formulas.hammerstad_1975 import Hammerstad1975
+from formulas.Wheeler_1977 import Wheeler_1977
+from formulas.hammerstad import HammerstadJensen
+from formulas.schneider import SchneiderMicrostrip
+from formulas.IPC2141 import IPC2141Microstrip
+from formulas.vectorized import ARRAY_MODELS, analyze_array, eeff_array, theta_array, z0_array
+
+# Capabilities a model can declare
+SCALAR = "scalar"                       # analyze/synthesize on single values
+VECTORIZED = "vectorized"               # analyze_array over NumPy arrays
+ANALYTIC_DERIVATIVES = "analytic_derivatives"
+CLOSED_FORM_SYNTHESIS = "closed_form_synthesis"
+
+# How a missing substrate parameter is named in error messages
+PARAM_LABELS = {
+    "er": "a dielectric constant (er)",
+    "h": "a dielectric height (h)",
+    "freq": "a frequency (freq)",
+    "t": "a thickness (t)",
+}
+
+
+class ModelSpec:
+    """
+    Declaration of one formula model.
+
+    name         : display name used by the UI and the API ("formula")
+    cls          : model class
+    params       : constructor arguments, in order; units are er (-),
+                   h and t (m), freq (GHz) for every model
+    analyze      : name of the scalar analyze method
+    synthesize   : name of the scalar synthesize method
+    has_length   : False for width-only models (analyze(w) -> Z0,
+                   synthesize(Z0) -> w)
+    validity     : {"w_over_h": (lo, hi), "er": (lo, hi)} published range
+    capabilities : set of SCALAR, VECTORIZED, ANALYTIC_DERIVATIVES,
+                   CLOSED_FORM_SYNTHESIS
+    closed_form  : method name used when CLOSED_FORM_SYNTHESIS is declared
+    """
+
+    def __init__(self, name, cls, params, analyze, synthesize, validity,
+                 capabilities, has_length=True, closed_form=None):
+        self.name = name
+        self.cls = cls
+        self.params = tuple(params)
+        self.analyze = analyze
+        self.synthesize = synthesize
+        self.validity = dict(validity)
+        self.capabilities = frozenset(capabilities)
+        self.has_length = has_length
+        self.closed_form = closed_form
+
+    def substrate_key(self, substrate):
+        """Constructor arguments from a dict, raising ValueError if one is missing."""
+        values = []
+        for p in self.params:
+            v = substrate.get(p)
+            if v is None:
+                raise ValueError(f"{self.name} formula requires {PARAM_LABELS.get(p, p)}.")
+            values.append(float(v))
+        return tuple(values)
+
+    def check_dimensions(self, w, l):
+        """Raise ValueError unless w > 0 and (for models with length) l >= 0."""
+        if w is None or not np.all(np.asarray(w, dtype=float) > 0):
+            raise ValueError("Width must be > 0.")
+        if not self.has_length:
+            return
+        if l is None:
+            raise ValueError(f"{self.name} formula requires a length (l).")
+        if not np.all(np.asarray(l, dtype=float) >= 0):
+            raise ValueError("Length must be >= 0.")
+
+    def out_of_range(self, er, w_over_h):
+        """Names of the validity limits that (er, w/h) falls outside of."""
+        out = []
+        for key, value in (("er", er), ("w_over_h", w_over_h)):
+            lo, hi = self.validity.get(key, (None, None))
+            if (lo is not None and value < lo) or (hi is not None and value > hi):
+                out.append(key)
+        return out
+
+    def warnings(self, substrate, w):
+        """Messages for each published validity limit a design falls outside of."""
+        er, h = float(substrate["er"]), float(substrate["h"])
+        values = {"er": er, "w_over_h": w / h}
+        return [f"{'w/h' if key == 'w_over_h' else key} = {values[key]:.4g} is outside the "
+                f"{self.name} validity range {self.validity[key][0]:g} to {self.validity[key][1]:g}."
+                for key in self.out_of_range(er, w / h)]
+
+
+MODELS = OrderedDict()
+
+
+def register(spec):
+    """Add a model to the registry (replacing one with the same name)."""
+    MODELS[spec.name] = spec
+    get_model.cache_clear()
+    return spec
+
+
+def get_spec(name):
+    try:
+        return MODELS[name]
+    except KeyError:
+        raise ValueError(f"Unknown formula: {name}")
+
+
+@lru_cache(maxsize=256)
+def get_model(name, key):
+    """Model instance for a formula and substrate key, shared between calls."""
+    return get_spec(name).cls(*key)
+
+
+def is_vectorized(spec):
+    """True if spec's analyze can go through the NumPy array evaluators."""
+    return VECTORIZED in spec.capabilities and spec.cls in ARRAY_MODELS
+
+
+def analyze(name, substrate, w, l=None):
+    """
+    Analyze one line. substrate holds the spec's params (SI, freq in GHz).
+    Returns (Z0, elecLen_deg); elecLen_deg is None for width-only models.
+    Raises ValueError for w <= 0, l < 0 or a missing l.
+    """
+    spec = get_spec(name)
+    model = get_model(name, spec.substrate_key(substrate))
+    spec.check_dimensions(w, l)
+    if not spec.has_length:
+        return float(getattr(model, spec.analyze)(w)), None
+    if is_vectorized(spec):
+        z0, theta = analyze_array(model, w, l)
+        return float(z0), float(theta)
+    z0, theta = getattr(model, spec.analyze)(w, l)
+    return float(z0), float(theta)
+
+
+def synthesize(name, substrate, zo, elecLen=None):
+    """
+    Synthesize one line. Returns (w, l) in meters; l is None for
+    width-only models. A target the model cannot reach raises ValueError,
+    whatever the model itself raises for it.
+    """
+    spec = get_spec(name)
+    model = get_model(name, spec.substrate_key(substrate))
+    if zo is None:
+        raise ValueError("A target impedance (zo) is required.")
+    if CLOSED_FORM_SYNTHESIS in spec.capabilities:
+        method = getattr(model, spec.closed_form)
+    else:
+        method = getattr(model, spec.synthesize)
+    try:
+        if not spec.has_length:
+            return float(method(zo)), None
+        w, l = method(zo, elecLen)
+    except RuntimeError as e:
+        # Some models wrap solver failures in RuntimeError
+        raise ValueError(str(e)) from e
+    return float(w), float(l)
+
+
+def analyze_batch(items):
+    """
+    Analyze many lines. Each item is a dict with "formula", the substrate
+    params, "w" and (for models with length) "l", all SI.
+
+    Vectorized models are grouped by (formula, er, h): er_eff and Z0 are
+    evaluated once per distinct width in the group, and the electrical
+    length of every item is then a product of beta, l and freq, so sweeps
+    over freq or l skip the logs and square roots. Other models are
+    grouped by (formula, substrate) and loop over one shared instance.
+    Returns (Z0, elecLen_deg) tuples in input order. Every item is
+    checked as in analyze() before anything is evaluated.
+    """
+    groups = OrderedDict()
+    for i, item in enumerate(items):
+        spec = get_spec(item["formula"])
+        key = spec.substrate_key(item)
+        try:
+            spec.check_dimensions(item.get("w"), item.get("l"))
+        except ValueError as e:
+            raise ValueError(f"Item {i}: {e}")
+        if is_vectorized(spec):
+            key = tuple(v for p, v in zip(spec.params, key) if p != "freq")
+        groups.setdefault((spec.name, key), []).append(i)
+
+    results = [None] * len(items)
+    for (name, key), idx in groups.items():
+        spec = MODELS[name]
+        if is_vectorized(spec):
+            er, h = key
+            w = np.array([items[i]["w"] for i in idx], dtype=float)
+            l = np.array([items[i]["l"] for i in idx], dtype=float)
+            f_hz = np.array([items[i]["freq"] for i in idx], dtype=float) * 1e9
+            U, inv = np.unique(w / h, return_inverse=True)
+            eeff = eeff_array(U, er)
+            z0 = z0_array(spec.cls, U, er, eeff)[inv]
+            theta = theta_array(spec.cls, eeff, 1.0, 1.0)[inv] * l * f_hz
+            for i, z, t in zip(idx, z0.tolist(), theta.tolist()):
+                results[i] = (z, t)
+        else:
+            for i in idx:
+                results[i] = analyze(name, dict(zip(spec.params, key)),
+                                     items[i]["w"], items[i].get("l"))
+    return results
+
+
+def synthesize_batch(items):
+    """
+    Synthesize many lines (items carry "formula", substrate params, "zo"
+    and "elecLen"). Instances are shared per (formula, substrate).
+    Returns (w, l) tuples in input order.
+    """
+    return [synthesize(item["formula"], item, item["zo"], item.get("elecLen"))
+            for item in items]
+
+
+_QUASI_STATIC = {"w_over_h": (0.05, 20.0), "er": (1.0, 16.0)}
+
+register(ModelSpec("Hammerstad and Jensen", HammerstadJensen, ("er", "h", "freq"),
+                   "analyze", "synthesize", {"w_over_h": (0.01, 100.0), "er": (1.0, 128.0)},
+                   {SCALAR, VECTORIZED}))
+register(ModelSpec("Wheeler 1965", Wheeler_1965, ("er", "h", "freq"),
+                   "Analyze", "Synthesize", _QUASI_STATIC, {SCALAR, VECTORIZED}))
+register(ModelSpec("Wheeler 1977", Wheeler_1977, ("er", "h", "freq"),
+                   "Analyze", "Synthesize", _QUASI_STATIC, {SCALAR, VECTORIZED}))
+register(ModelSpec("Hammerstad 1975", Hammerstad1975, ("er", "h", "freq"),
+                   "analyze", "synthesize", _QUASI_STATIC, {SCALAR, VECTORIZED}))
+register(ModelSpec("Schneider", SchneiderMicrostrip, ("er", "h", "freq"),
+                   "analyze", "synthesize", _QUASI_STATIC, {SCALAR, VECTORIZED}))
+register(ModelSpec("IPC2141", IPC2141Microstrip, ("er", "h", "t"),
+                   "analyze", "synthesize", {"w_over_h": (0.1, 2.0), "er": (1.0, 15.0)},
+                   {SCALAR, CLOSED_FORM_SYNTHESIS}, has_length=False,
+                   closed_form="synthesize_closed_form"))
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from formulas import registry
+from formulas.hammerstad import HammerstadJensen
+from formulas.incremental import AnalysisSession, IncrementalAnalyzer
+
+SUBSTRATE = {"er": 4.4, "h": 1.6e-3, "freq": 2.4, "t": 35e-6}
+
+
+@pytest.mark.parametrize("name", list(registry.MODELS))
+def test_session_matches_registry(name):
+    session = AnalysisSession()
+    for freq in (1.0, 2.4):
+        for l in (10e-3, 30e-3):
+            sub = dict(SUBSTRATE, freq=freq)
+            l = l if registry.get_spec(name).has_length else None
+            assert session.analyze(name, sub, 3e-3, l) == pytest.approx(registry.analyze(name, sub, 3e-3, l))
+
+
+@pytest.mark.parametrize("w, l", [(0.0, 30e-3), (3e-3, -1e-3), (3e-3, None)])
+def test_session_rejects_bad_dimensions(w, l):
+    with pytest.raises(ValueError):
+        AnalysisSession().analyze("Hammerstad and Jensen", SUBSTRATE, w, l)
+
+
+def test_analyzer_reuses_and_returns_copies():
+    inc = IncrementalAnalyzer(HammerstadJensen)
+    w = np.array([1e-3, 3e-3])
+    z0, theta = inc.analyze(4.4, 1.6e-3, 2.4, w, 30e-3)
+    expected = z0.copy(), theta.copy()
+    z0[:] = 0
+    theta[:] = 0
+    again = inc.analyze(4.4, 1.6e-3, 2.4, w, 30e-3)
+    np.testing.assert_array_equal(again[0], expected[0])
+    np.testing.assert_array_equal(again[1], expected[1])
+    inc.analyze(4.4, 1.6e-3, 5.0, w, 30e-3)
+    assert (inc.eeff.evals, inc.z0.evals, inc.theta.evals) == (1, 1, 2)
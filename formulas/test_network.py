@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pytest
+
+from formulas.hammerstad import HammerstadJensen
+from formulas.network import abcd_to_s, cascade_abcd, segment_abcd, write_touchstone
+from formulas.wheeler_1965 import Wheeler_1965
+
+FREQS = np.linspace(0.1, 10.0, 50)
+SEGMENTS = [(HammerstadJensen(4.4, 1.6e-3, 2.4), 3e-3, 10e-3),
+            (Wheeler_1965(4.4, 1.6e-3, 2.4), 0.5e-3, 7e-3),
+            (HammerstadJensen(3.0, 0.8e-3, 0.0), 1.8e-3, 12e-3)]
+
+
+def test_cascade_matches_matmul():
+    expected = np.broadcast_to(np.eye(2, dtype=complex), (len(FREQS), 2, 2))
+    for model, w, l in SEGMENTS:
+        expected = expected @ segment_abcd(model, w, l, FREQS)
+    np.testing.assert_allclose(cascade_abcd(SEGMENTS, FREQS), expected, atol=1e-12)
+
+
+def test_design_freq_is_ignored():
+    a = cascade_abcd([(HammerstadJensen(4.4, 1.6e-3, 0.0), 3e-3, 10e-3)], FREQS)
+    b = cascade_abcd([(HammerstadJensen(4.4, 1.6e-3, 7.0), 3e-3, 10e-3)], FREQS)
+    np.testing.assert_allclose(a, b)
+
+
+def test_s_lossless_and_reciprocal():
+    s = abcd_to_s(cascade_abcd(SEGMENTS, FREQS))
+    np.testing.assert_allclose(abs(s[:, 0, 0]) ** 2 + abs(s[:, 1, 0]) ** 2, 1.0, atol=1e-12)
+    np.testing.assert_allclose(s[:, 0, 1], s[:, 1, 0], atol=1e-12)
+
+
+def test_matched_line_is_transparent():
+    # A line terminated in its own Z0 reflects nothing at any frequency
+    model, w, l = SEGMENTS[0]
+    z0, _ = model.analyze(w, l)
+    s = abcd_to_s(segment_abcd(model, w, l, FREQS), z_ref=z0)
+    np.testing.assert_allclose(abs(s[:, 0, 0]), 0.0, atol=1e-9)
+
+
+def test_touchstone_layout():
+    s = np.arange(2 * 4, dtype=float).reshape(2, 2, 2) + 1j * np.arange(100, 108).reshape(2, 2, 2)
+    out = io.StringIO()
+    write_touchstone(out, [1.0, 2.0], s, z_ref=50, comment="two\nlines", chunk=1)
+    lines = out.getvalue().splitlines()
+    assert lines[:3] == ["! two", "! lines", "# GHz S RI R 50"]
+    rows = [list(map(float, line.split())) for line in lines[3:]]
+    assert len(rows) == 2
+    for k, row in enumerate(rows):
+        m = s[k]
+        expected = [1.0 + k]
+        for i, j in ((0, 0), (1, 0), (0, 1), (1, 1)):      # S11 S21 S12 S22
+            expected += [m[i, j].real, m[i, j].imag]
+        assert row == pytest.approx(expected)
+
+
+def test_touchstone_path(tmp_path):
+    s = abcd_to_s(cascade_abcd(SEGMENTS, FREQS))
+    write_touchstone(tmp_path / "line.s2p", FREQS, s)
+    write_touchstone(str(tmp_path / "line2.s2p"), FREQS, s)
+    assert (tmp_path / "line.s2p").read_text() == (tmp_path / "line2.s2p").read_text()
+    assert len((tmp_path / "line.s2p").read_text().splitlines()) == len(FREQS) + 1
@@ -0,0 +1,126 @@
+import math
+
+import pytest
+
+from app import app
+from formulas import registry
+
+SUBSTRATE = {"er": 4.4, "h": 1.6e-3, "freq": 2.4, "t": 35e-6}
+LENGTH_MODELS = [name for name, spec in registry.MODELS.items() if spec.has_length]
+ANALYZE = {"formula": "Hammerstad and Jensen", "er": 4.4, "h": 1.6, "freq": 2.4,
+           "width_mm": 3.0, "length_mm": 30.0}
+
+
+def _model(name):
+    spec = registry.get_spec(name)
+    return spec, spec.cls(*spec.substrate_key(SUBSTRATE))
+
+
+@pytest.mark.parametrize("name", list(registry.MODELS))
+def test_analyze_matches_scalar(name):
+    spec, model = _model(name)
+    for w in (0.5e-3, 1.6e-3, 3e-3, 8e-3):
+        if spec.has_length:
+            z0, theta = getattr(model, spec.analyze)(w, 30e-3)
+            assert registry.analyze(name, SUBSTRATE, w, 30e-3) == pytest.approx((z0, theta), rel=1e-9)
+        else:
+            z0 = getattr(model, spec.analyze)(w)
+            assert registry.analyze(name, SUBSTRATE, w) == (pytest.approx(z0, rel=1e-9), None)
+
+
+@pytest.mark.parametrize("name", list(registry.MODELS))
+def test_synthesize_matches_scalar(name):
+    spec, model = _model(name)
+    if spec.has_length:
+        w, l = registry.synthesize(name, SUBSTRATE, 50.0, 90.0)
+        assert (w, l) == pytest.approx(getattr(model, spec.synthesize)(50.0, 90.0), rel=1e-6)
+    else:
+        # Closed-form inverse: analyzing the width gives back the target exactly
+        w, l = registry.synthesize(name, SUBSTRATE, 50.0)
+        assert l is None
+        assert getattr(model, spec.analyze)(w) == pytest.approx(50.0, rel=1e-9)
+
+
+def test_analyze_batch_matches_analyze():
+    items = [dict(SUBSTRATE, formula=name, w=w, l=l, freq=f)
+             for name in registry.MODELS
+             for w in (0.8e-3, 3e-3) for l in (10e-3, 30e-3) for f in (1.0, 2.4)]
+    expected = [registry.analyze(i["formula"], i, i["w"], i["l"]) for i in items]
+    for got, want in zip(registry.analyze_batch(items), expected):
+        assert got[0] == pytest.approx(want[0], rel=1e-9)
+        if want[1] is None:
+            assert got[1] is None
+        else:
+            assert got[1] == pytest.approx(want[1], rel=1e-9)
+
+
+@pytest.mark.parametrize("w, l", [(0.0, 30e-3), (-1e-3, 30e-3), (3e-3, -1e-3), (3e-3, None)])
+@pytest.mark.parametrize("name", LENGTH_MODELS)
+def test_analyze_rejects_bad_dimensions(name, w, l):
+    with pytest.raises(ValueError):
+        registry.analyze(name, SUBSTRATE, w, l)
+    with pytest.raises(ValueError, match="Item 1"):
+        registry.analyze_batch([dict(SUBSTRATE, formula=name, w=3e-3, l=30e-3),
+                                dict(SUBSTRATE, formula=name, w=w, l=l)])
+
+
+def test_ipc2141_impedance_too_high_is_value_error():
+    with pytest.raises(ValueError):
+        registry.synthesize("IPC2141", SUBSTRATE, 300.0)
+
+
+def test_out_of_range_warnings():
+    spec = registry.get_spec("Wheeler 1965")
+    assert spec.warnings(SUBSTRATE, 3e-3) == []
+    assert len(spec.warnings(dict(SUBSTRATE, er=30.0), 0.01e-3)) == 2
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize("payload", [
+    dict(ANALYZE, width_mm=0),
+    dict(ANALYZE, width_mm=-1),
+    dict(ANALYZE, length_mm=-1),
+    {k: v for k, v in ANALYZE.items() if k != "length_mm"},
+    {k: v for k, v in ANALYZE.items() if k != "width_mm"},
+])
+def test_analyze_endpoint_400(client, payload):
+    r = client.post("/analyze", json=payload)
+    assert r.status_code == 400
+    assert "error" in r.get_json()
+
+
+def test_batch_endpoint_400(client):
+    r = client.post("/batch", json={"mode": "analyze", "items": [ANALYZE, dict(ANALYZE, width_mm=0)]})
+    assert r.status_code == 400
+    assert r.get_json()["error"].startswith("Item 1")
+
+
+def test_synthesize_endpoint_400(client):
+    payload = {"formula": "IPC2141", "er": 4.4, "h": 1.6, "t": 0.035}
+    assert client.post("/synthesize", json=dict(payload, zo=300)).status_code == 400
+    assert client.post("/synthesize", json=payload).status_code == 400
+
+
+# Wheeler 1965 fails with RuntimeError, the others with ValueError;
+# Hammerstad and Jensen still finds a (very narrow) line for 500 ohm
+@pytest.mark.parametrize("name", ["Wheeler 1965", "Wheeler 1977", "Hammerstad 1975", "Schneider"])
+def test_synthesize_unreachable_target_400(client, name):
+    payload = {"formula": name, "er": 4.4, "h": 1.6, "freq": 2.4, "zo": 500, "elecLen": 90}
+    r = client.post("/synthesize", json=payload)
+    assert r.status_code == 400
+    assert "error" in r.get_json()
+    r = client.post("/batch", json={"mode": "synthesize", "items": [dict(payload, zo=50), payload]})
+    assert r.status_code == 400
+
+
+def test_analyze_endpoint_ok(client):
+    r = client.post("/analyze", json=ANALYZE)
+    assert r.status_code == 200
+    body = r.get_json()
+    assert math.isfinite(body["zo"]) and math.isfinite(body["elecLen"])
+    assert "warnings" not in body
+    assert "warnings" in client.post("/analyze", json=dict(ANALYZE, width_mm=0.01)).get_json()
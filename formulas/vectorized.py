@@ -0,0 +1,90 @@
+import numpy as np
+
+from formulas.wheeler_1965 import Wheeler_1965
+from formulas.hammerstad_1975 import Hammerstad1975
+from formulas.Wheeler_1977 import Wheeler_1977
+from formulas.hammerstad import HammerstadJensen
+from formulas.schneider import SchneiderMicrostrip
+
+
+def eeff_array(U, er):
+    """Quasi-static effective permittivity shared by all the models below."""
+    return (er + 1) / 2 + (er - 1) / 2 / np.sqrt(1 + 12 / U)
+
+
+def _branch_z0(branch):
+    """Wheeler/Hammerstad two-branch Z0, switching at w/h == branch."""
+    def z0(U, er, eeff):
+        sq = np.sqrt(eeff)
+        narrow = 60 / sq * np.log(8 / U + 0.25 * U)
+        wide = 120 * np.pi / (sq * (U + 1.393 + 0.667 * np.log(U + 1.444)))
+        return np.where(U <= branch, narrow, wide)
+    return z0
+
+
+def _wheeler_1977_z0(U, er, eeff):
+    # Wheeler's 1977 Z0 does not go through er_eff
+    A = ((14 + 8 / er) / 11) * (4 / U)
+    return (42.4 / np.sqrt(er + 1)) * np.log(
+        1 + (4 / U) * (A + np.sqrt(A ** 2 + (np.pi ** 2 / 2) * (1 + 1 / er)))
+    )
+
+
+# model class -> (Z0(w/h, er, er_eff), GHz->Hz factor applied to model.freq, c used by the model)
+ARRAY_MODELS = {
+    Wheeler_1965: (_branch_z0(3.3), 1e9, 2.99792458e8),
+    Hammerstad1975: (_branch_z0(1.0), 1e9, 2.99792458e8),
+    HammerstadJensen: (_branch_z0(1.0), 1e9, 2.99792458e8),
+    SchneiderMicrostrip: (_branch_z0(1.0), 1.0, 3e8),     # Schneider stores Hz
+    Wheeler_1977: (_wheeler_1977_z0, 1e9, 2.99792458e8),
+}
+
+
+def _spec(cls):
+    try:
+        return ARRAY_MODELS[cls]
+    except KeyError:
+        raise ValueError(f"No array evaluation for {cls.__name__}")
+
+
+def model_freq_hz(model):
+    """Design frequency of a model instance in Hz (Schneider already stores Hz)."""
+    freq_scale = _spec(type(model))[1]
+    return model.freq * freq_scale
+
+
+def z0_array(cls, U, er, eeff):
+    """Z0 (ohm) of model class cls for w/h = U, given er_eff from eeff_array."""
+    return _spec(cls)[0](U, er, eeff)
+
+
+def theta_array(cls, eeff, freq_hz, l):
+    """Electrical length (deg) of length l (m) at freq_hz, given er_eff."""
+    return 360 * l * freq_hz * np.sqrt(eeff) / _spec(cls)[2]
+
+
+def analyze_array(model, w, l):
+    """
+    Vectorized analyze() for a formula model instance.
+    w, l are arrays in meters (broadcast together); returns
+    (Z0 (ohm), electrical_length (deg)) arrays, matching the scalar
+    Analyze/analyze of the same model to rounding.
+    """
+    if l is None:
+        raise ValueError("analyze_array needs a length l.")
+    cls = type(model)
+    f_hz = model_freq_hz(model)
+    U = np.asarray(w, dtype=float) / model.h
+    eeff = eeff_array(U, model.er)
+    z0 = z0_array(cls, U, model.er, eeff)
+    theta = theta_array(cls, eeff, f_hz, np.asarray(l, dtype=float))
+    return np.broadcast_to(z0, theta.shape), theta
+
+
+if __name__ == "__main__":
+    # Run from the repository root: python -m formulas.vectorized
+    model = HammerstadJensen(er=4.4, h=1.6e-3, freq=2.4)
+    w = np.linspace(0.5e-3, 5e-3, 5)
+    Z0, theta = analyze_array(model, w, 30e-3)
+    for wi, z, t in zip(w, Z0, theta):
+        print(f"w = {wi * 1000:.3f} mm -> Z0 = {z:.3f} Ω, θ = {t:.3f}°")
@@ -0,0 +1,294 @@
+"""
+Local background jobs for large batch, sweep and tolerance runs.
+
+Jobs live in a SQLite file (no broker). A job is split into chunks of
+items when it is submitted; worker processes claim chunks one at a time,
+so a single large job spreads over every worker and several jobs share
+them in submission order. Web handlers only read and write the database.
+
+Run the workers next to the web app, pointing at the same database:
+
+    python jobs.py --workers 4          # default: one per CPU core
+
+Idle workers delete finished jobs older than --keep-hours (default 24).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import time
+import uuid
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "jobs.sqlite3")
+CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 10000
+MAX_ITEMS = 200000              # per job; results are kept in the database
+KEEP_SECONDS = 24 * 3600        # finished jobs are deleted after this long
+CLEANUP_EVERY = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    mode        TEXT NOT NULL,
+    status      TEXT NOT NULL,      -- queued, running, done, failed, cancelled
+    items       INTEGER NOT NULL,
+    chunks      INTEGER NOT NULL,
+    done_chunks INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    created     REAL NOT NULL,
+    finished    REAL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    job_id  TEXT NOT NULL,
+    idx     INTEGER NOT NULL,
+    status  TEXT NOT NULL,          -- queued, running, done, failed, cancelled
+    input   TEXT NOT NULL,
+    output  TEXT,
+    worker  INTEGER,                -- pid holding the lease while running
+    claimed REAL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS chunks_queued ON chunks (status, job_id, idx);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+"""
+
+
+def connect(path=DEFAULT_DB):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(chunks)")}
+    for name, kind in (("worker", "INTEGER"), ("claimed", "REAL")):
+        if name not in columns:
+            try:
+                conn.execute(f"ALTER TABLE chunks ADD COLUMN {name} {kind}")
+            except sqlite3.OperationalError:
+                pass            # added by a concurrent connect
+    return conn
+
+
+def submit(conn, mode, items, chunk_size=CHUNK_SIZE):
+    """
+    Queue a job. mode is "analyze" or "synthesize"; items are registry
+    items (SI units, see formulas.registry.analyze_batch). Returns the id.
+    """
+    if mode not in ("analyze", "synthesize"):
+        raise ValueError("mode must be 'analyze' or 'synthesize'.")
+    if not items:
+        raise ValueError("A job needs at least one item.")
+    if len(items) > MAX_ITEMS:
+        raise ValueError(f"A job can have at most {MAX_ITEMS} items.")
+    if not 1 <= chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}.")
+    job_id = uuid.uuid4().hex
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, mode, status, items, chunks, created) VALUES (?, ?, 'queued', ?, ?, ?)",
+            (job_id, mode, len(items), len(chunks), time.time()),
+        )
+        conn.executemany(
+            "INSERT INTO chunks (job_id, idx, status, input) VALUES (?, ?, 'queued', ?)",
+            [(job_id, i, json.dumps(c)) for i, c in enumerate(chunks)],
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return job_id
+
+
+def status(conn, job_id):
+    """Job row as a dict (with progress in [0, 1]), or None if unknown."""
+    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job["progress"] = job["done_chunks"] / job["chunks"] if job["chunks"] else 1.0
+    return job
+
+
+def cancel(conn, job_id):
+    """Cancel a queued or running job; chunks already running finish but are ignored."""
+    conn.execute("BEGIN IMMEDIATE")
+    cur = conn.execute(
+        "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status IN ('queued', 'running')",
+        (time.time(), job_id),
+    )
+    if cur.rowcount:
+        conn.execute("UPDATE chunks SET status = 'cancelled' WHERE job_id = ? AND status = 'queued'", (job_id,))
+    conn.execute("COMMIT")
+    return status(conn, job_id)
+
+
+def chunk_results(conn, job_id, idx):
+    """Output of one finished chunk as a list, or None if it is not done."""
+    row = conn.execute(
+        "SELECT output FROM chunks WHERE job_id = ? AND idx = ? AND status = 'done'", (job_id, idx)
+    ).fetchone()
+    return None if row is None else json.loads(row["output"])
+
+
+def cleanup(conn, keep=KEEP_SECONDS):
+    """Delete jobs (and their chunks) that finished more than `keep` seconds ago."""
+    cutoff = time.time() - keep
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute(
+        "DELETE FROM chunks WHERE job_id IN (SELECT id FROM jobs WHERE finished < ?)", (cutoff,)
+    )
+    cur = conn.execute("DELETE FROM jobs WHERE finished < ?", (cutoff,))
+    conn.execute("COMMIT")
+    return cur.rowcount
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def requeue_dead(conn):
+    """Re-queue running chunks whose worker process no longer exists; returns the count."""
+    conn.execute("BEGIN IMMEDIATE")
+    rows = conn.execute("SELECT job_id, idx, worker FROM chunks WHERE status = 'running'").fetchall()
+    dead = [(r["job_id"], r["idx"]) for r in rows if r["worker"] is None or not _alive(r["worker"])]
+    conn.executemany(
+        "UPDATE chunks SET status = 'queued', worker = NULL, claimed = NULL "
+        "WHERE job_id = ? AND idx = ? AND status = 'running'",
+        dead,
+    )
+    conn.execute("COMMIT")
+    return len(dead)
+
+
+def _claim(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    row = conn.execute(
+        "SELECT c.job_id, c.idx, c.input, j.mode FROM chunks c JOIN jobs j ON j.id = c.job_id "
+        "WHERE c.status = 'queued' AND j.status IN ('queued', 'running') ORDER BY j.created, c.idx LIMIT 1"
+    ).fetchone()
+    if row is None:
+        conn.execute("COMMIT")
+        return None
+    conn.execute(
+        "UPDATE chunks SET status = 'running', worker = ?, claimed = ? WHERE job_id = ? AND idx = ?",
+        (os.getpid(), time.time(), row["job_id"], row["idx"]),
+    )
+    conn.execute("UPDATE jobs SET status = 'running' WHERE id = ? AND status = 'queued'", (row["job_id"],))
+    conn.execute("COMMIT")
+    return row
+
+
+def _finish(conn, job_id, idx, output=None, error=None):
+    # Only a chunk still marked running counts: a chunk finished twice (it
+    # was re-queued while its first worker was still on it) or one of a
+    # cancelled job leaves the job untouched
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    if error is None:
+        cur = conn.execute(
+            "UPDATE chunks SET status = 'done', output = ? WHERE job_id = ? AND idx = ? AND status = 'running'",
+            (json.dumps(output), job_id, idx),
+        )
+        if cur.rowcount:
+            conn.execute(
+                "UPDATE jobs SET done_chunks = done_chunks + 1 WHERE id = ? AND status = 'running'", (job_id,)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'done', finished = ? "
+                "WHERE id = ? AND status = 'running' AND done_chunks = chunks",
+                (now, job_id),
+            )
+    else:
+        cur = conn.execute(
+            "UPDATE chunks SET status = 'failed' WHERE job_id = ? AND idx = ? AND status = 'running'", (job_id, idx)
+        )
+        if cur.rowcount:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished = ? WHERE id = ? AND status = 'running'",
+                (error, now, job_id),
+            )
+        if cur.rowcount:
+            conn.execute("UPDATE chunks SET status = 'cancelled' WHERE job_id = ? AND status = 'queued'", (job_id,))
+    conn.execute("COMMIT")
+
+
+def _run_chunk(mode, items):
+    from formulas import registry
+
+    if mode == "analyze":
+        return registry.analyze_batch(items)
+    return registry.synthesize_batch(items)
+
+
+def worker(path=DEFAULT_DB, poll=0.2, keep=KEEP_SECONDS):
+    """Claim and run chunks until the process is terminated."""
+    conn = connect(path)
+    last_cleanup = 0.0
+    while True:
+        row = _claim(conn)
+        if row is None:
+            if time.time() - last_cleanup > CLEANUP_EVERY:
+                requeue_dead(conn)
+                cleanup(conn, keep)
+                last_cleanup = time.time()
+            time.sleep(poll)
+            continue
+        try:
+            output = _run_chunk(row["mode"], json.loads(row["input"]))
+        except Exception as e:
+            _finish(conn, row["job_id"], row["idx"], error=f"chunk {row['idx']}: {e}")
+        else:
+            _finish(conn, row["job_id"], row["idx"], output=output)
+
+
+def _terminate(signum, frame):
+    raise SystemExit(128 + signum)
+
+
+def run_pool(path=DEFAULT_DB, workers=None, keep=KEEP_SECONDS):
+    """
+    Start `workers` processes (default: CPU count) and wait for them.
+    Ctrl-C or SIGTERM stops the workers before the pool exits.
+    """
+    conn = connect(path)
+    # Chunks whose worker died with a previous pool are re-queued; chunks
+    # of workers that are still alive keep their lease
+    requeue_dead(conn)
+    conn.close()
+
+    procs = [multiprocessing.Process(target=worker, args=(path, 0.2, keep), daemon=True)
+             for _ in range(workers or os.cpu_count() or 1)]
+    previous = signal.signal(signal.SIGTERM, _terminate)
+    try:
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        started = [p for p in procs if p.pid is not None]
+        for p in started:
+            p.terminate()
+        for p in started:
+            p.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--db", default=os.environ.get("MICROSTRIP_JOBS_DB", DEFAULT_DB))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--keep-hours", type=float, default=KEEP_SECONDS / 3600)
+    args = parser.parse_args()
+    run_pool(args.db, args.workers, args.keep_hours * 3600)
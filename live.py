@@ -0,0 +1,77 @@
+import json
+import threading
+
+
+class LiveSession:
+    """
+    State of one live-update connection.
+
+    The receive loop merges each incoming partial update into `params`
+    and marks it pending; a single worker thread computes the pending
+    state. Updates that arrive while a computation is running supersede
+    it: the running result is dropped (a sympy nsolve cannot be
+    interrupted) and only the newest state is computed and pushed.
+    Rapid slider input therefore costs at most one computation in flight
+    plus one queued, per session.
+    """
+
+    def __init__(self, ws, compute):
+        self.ws = ws
+        self.compute = compute      # params -> (body, status)
+        self.params = {}
+        self.pending = None         # (seq, params snapshot) awaiting compute
+        self.closed = False
+        self.cond = threading.Condition()
+        self.send_lock = threading.Lock()
+
+    def run(self):
+        worker = threading.Thread(target=self._work, name="live-worker", daemon=True)
+        worker.start()
+        try:
+            while True:
+                msg = self.ws.receive()
+                if msg is None:
+                    break
+                try:
+                    update = json.loads(msg)
+                    if not isinstance(update, dict):
+                        raise ValueError
+                except ValueError:
+                    self._send({"error": "Expected a JSON object."})
+                    continue
+                with self.cond:
+                    seq = update.pop("seq", None)
+                    self.params.update(update)
+                    self.pending = (seq, dict(self.params))
+                    self.cond.notify()
+        finally:
+            with self.cond:
+                self.closed = True
+                self.cond.notify()
+
+    def _work(self):
+        while True:
+            with self.cond:
+                while self.pending is None and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                seq, params = self.pending
+                self.pending = None
+
+            try:
+                body, status = self.compute(params)
+            except Exception as e:
+                body, status = {"error": str(e) or "Wrong Inputs!!"}, 400
+
+            with self.cond:
+                if self.pending is not None or self.closed:
+                    continue    # superseded while computing
+            self._send(dict(body, seq=seq, mode=params.get("mode"), status=status))
+
+    def _send(self, body):
+        with self.send_lock:
+            try:
+                self.ws.send(json.dumps(body))
+            except Exception:
+                pass    # connection went away; run() will see it on receive
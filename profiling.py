@@ -0,0 +1,227 @@
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from flask import abort, g, jsonify, request
+
+
+def _summarize(data, limit):
+    """
+    Bounded copy of a request body for storage: lists longer than a few
+    entries keep their head and length, and anything still over `limit`
+    characters of JSON is kept as a truncated string.
+    """
+    def shrink(x):
+        if isinstance(x, dict):
+            return {k: shrink(v) for k, v in x.items()}
+        if isinstance(x, list):
+            if len(x) > 3:
+                return {"len": len(x), "head": [shrink(v) for v in x[:3]]}
+            return [shrink(v) for v in x]
+        return x
+
+    data = shrink(data)
+    text = json.dumps(data)
+    if len(text) > limit:
+        return {"truncated": text[:limit]}
+    return data
+
+
+def _collapse(frame):
+    """Render a frame chain as a collapsed stack ("root;...;leaf")."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class _Sampler(threading.Thread):
+    """
+    Background thread that snapshots the stacks of registered request
+    threads every `interval` seconds. Sleeps when nothing is registered.
+    """
+
+    def __init__(self, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.active = {}            # thread ident -> Counter of collapsed stacks
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def register(self, ident):
+        counter = Counter()
+        with self.lock:
+            self.active[ident] = counter
+        self.wake.set()
+        return counter
+
+    def unregister(self, ident):
+        with self.lock:
+            self.active.pop(ident, None)
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            time.sleep(self.interval)
+            with self.lock:
+                items = list(self.active.items())
+                if not items:
+                    self.wake.clear()
+                    continue
+            frames = sys._current_frames()
+            for ident, counter in items:
+                frame = frames.get(ident)
+                if frame is not None:
+                    counter[_collapse(frame)] += 1
+
+
+class RequestProfiler:
+    """
+    Opt-in profiling of Flask requests, kept in a bounded in-memory ring.
+
+    A request is kept when it takes at least PROFILE_THRESHOLD_MS, when it
+    was picked by PROFILE_SAMPLE_RATE, or when it carries an X-Profile
+    header equal to PROFILE_TOKEN. PROFILE_MODE is "sampling" (stack
+    sampling thread, low overhead, collapsed-stack output) or "cprofile"
+    (deterministic, pstats output, slows every profiled request; only one
+    request is captured at a time, since Python 3.12 allows a single
+    active profiler per process, and concurrent requests run unprofiled).
+    Nothing is installed unless one of the triggers is configured. Stored
+    request bodies are summarized to at most PROFILE_INPUT_CHARS of JSON.
+    WebSocket routes (PROFILE_EXCLUDE, default /live) are never profiled:
+    they last the whole connection and their work runs on another thread.
+
+    Admin endpoints, registered only when PROFILE_TOKEN is set
+    (X-Admin-Token must match it):
+      GET /admin/profiles        -> list of kept profiles
+      GET /admin/profiles/<id>   -> profile body as text/plain
+    """
+
+    def __init__(self, app=None):
+        self.profiles = deque()
+        self._ids = itertools.count(1)
+        self._sampler = None
+        self._sampler_lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()      # held while a cProfile capture runs
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cfg = app.config
+        self.threshold_ms = cfg.get("PROFILE_THRESHOLD_MS")
+        self.sample_rate = float(cfg.get("PROFILE_SAMPLE_RATE", 0.0))
+        self.token = cfg.get("PROFILE_TOKEN")
+        self.mode = cfg.get("PROFILE_MODE", "sampling")
+        self.interval = float(cfg.get("PROFILE_INTERVAL_MS", 5)) / 1000.0
+        self.profiles = deque(maxlen=int(cfg.get("PROFILE_KEEP", 20)))
+        self.input_chars = int(cfg.get("PROFILE_INPUT_CHARS", 2000))
+        self.exclude = ("/admin/", "/static/") + tuple(cfg.get("PROFILE_EXCLUDE", ["/live"]))
+
+        if self.mode not in ("sampling", "cprofile"):
+            raise ValueError(f"PROFILE_MODE must be 'sampling' or 'cprofile', got {self.mode!r}")
+        if self.threshold_ms is None and self.sample_rate <= 0 and not self.token:
+            return
+
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+        if not self.token:
+            return
+        app.add_url_rule("/admin/profiles", "profiles_list", self._list)
+        app.add_url_rule("/admin/profiles/<int:profile_id>", "profiles_get", self._get)
+
+    def _trigger(self):
+        if self.token and request.headers.get("X-Profile") == self.token:
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        if self.threshold_ms is not None:
+            return "threshold"
+        return None
+
+    def _start(self):
+        if request.path.startswith(self.exclude):
+            return
+        trigger = self._trigger()
+        if trigger is None:
+            return
+        inputs = _summarize(request.get_json(silent=True), self.input_chars)
+        if self.mode == "cprofile":
+            if not self._cprofile_lock.acquire(blocking=False):
+                return
+            handle = cProfile.Profile()
+            try:
+                handle.enable()
+            except ValueError:
+                # Another profiler (debugger, coverage, ...) is active
+                self._cprofile_lock.release()
+                return
+        else:
+            with self._sampler_lock:
+                if self._sampler is None:
+                    self._sampler = _Sampler(self.interval)
+                    self._sampler.start()
+            handle = self._sampler.register(threading.get_ident())
+        g.profile_trigger = trigger
+        g.profile_inputs = inputs
+        g.profile_start = time.perf_counter()
+        g.profile_handle = handle
+
+    def _stop(self, exc=None):
+        handle = g.pop("profile_handle", None)
+        if handle is None:
+            return
+        duration_ms = (time.perf_counter() - g.pop("profile_start")) * 1000.0
+        if self.mode == "cprofile":
+            handle.disable()
+            self._cprofile_lock.release()
+        else:
+            self._sampler.unregister(threading.get_ident())
+
+        trigger = g.profile_trigger
+        if trigger == "threshold" and duration_ms < self.threshold_ms:
+            return
+
+        if self.mode == "cprofile":
+            out = io.StringIO()
+            pstats.Stats(handle, stream=out).sort_stats("cumulative").print_stats(50)
+            body = out.getvalue()
+        else:
+            body = "\n".join(f"{stack} {n}" for stack, n in handle.most_common())
+
+        self.profiles.append({
+            "id": next(self._ids),
+            "time": time.time(),
+            "method": request.method,
+            "path": request.path,
+            "inputs": g.profile_inputs,
+            "duration_ms": duration_ms,
+            "trigger": trigger,
+            "error": repr(exc) if exc is not None else None,
+            "format": "pstats" if self.mode == "cprofile" else "collapsed",
+            "body": body,
+        })
+
+    def _check_admin(self):
+        if not self.token or request.headers.get("X-Admin-Token") != self.token:
+            abort(403)
+
+    def _list(self):
+        self._check_admin()
+        return jsonify([{k: v for k, v in p.items() if k != "body"} for p in self.profiles])
+
+    def _get(self, profile_id):
+        self._check_admin()
+        for p in self.profiles:
+            if p["id"] == profile_id:
+                return p["body"], 200, {"Content-Type": "text/plain; charset=utf-8"}
+        abort(404)
@@ -0,0 +1,187 @@
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+import jobs
+from app import app
+
+ITEM = {"formula": "Hammerstad and Jensen", "er": 4.4, "h": 1.6e-3, "freq": 2.4, "w": 3e-3, "l": 30e-3}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = jobs.connect(str(tmp_path / "jobs.sqlite3"))
+    yield conn
+    conn.close()
+
+
+def _run_all(conn):
+    while True:
+        row = jobs._claim(conn)
+        if row is None:
+            return
+        jobs._finish(conn, row["job_id"], row["idx"], output=jobs._run_chunk(row["mode"], json.loads(row["input"])))
+
+
+def test_submit_claim_finish_results(conn):
+    items = [dict(ITEM, w=w * 1e-3) for w in (1, 2, 3, 4, 5)]
+    job_id = jobs.submit(conn, "analyze", items, chunk_size=2)
+    job = jobs.status(conn, job_id)
+    assert (job["status"], job["items"], job["chunks"], job["progress"]) == ("queued", 5, 3, 0.0)
+
+    row = jobs._claim(conn)
+    assert (row["job_id"], row["idx"], row["mode"]) == (job_id, 0, "analyze")
+    assert jobs.status(conn, job_id)["status"] == "running"
+    assert jobs.chunk_results(conn, job_id, 0) is None
+    jobs._finish(conn, job_id, 0, output=jobs._run_chunk("analyze", json.loads(row["input"])))
+    assert jobs.status(conn, job_id)["progress"] == pytest.approx(1 / 3)
+
+    _run_all(conn)
+    job = jobs.status(conn, job_id)
+    assert (job["status"], job["done_chunks"], job["progress"]) == ("done", 3, 1.0)
+    assert job["finished"] is not None
+    from formulas import registry
+    results = [r for i in range(3) for r in jobs.chunk_results(conn, job_id, i)]
+    assert results == [list(r) for r in registry.analyze_batch(items)]
+
+
+def test_failed_chunk_fails_job(conn):
+    job_id = jobs.submit(conn, "analyze", [ITEM] * 4, chunk_size=1)
+    row = jobs._claim(conn)
+    jobs._finish(conn, job_id, row["idx"], error="boom")
+    job = jobs.status(conn, job_id)
+    assert (job["status"], job["error"]) == ("failed", "boom")
+    assert jobs._claim(conn) is None
+
+
+def test_cancel(conn):
+    job_id = jobs.submit(conn, "analyze", [ITEM] * 4, chunk_size=1)
+    row = jobs._claim(conn)
+    assert jobs.cancel(conn, job_id)["status"] == "cancelled"
+    assert jobs._claim(conn) is None
+    # The chunk that was already running finishes but does not revive the job
+    jobs._finish(conn, job_id, row["idx"], output=[[50.0, 90.0]])
+    job = jobs.status(conn, job_id)
+    assert (job["status"], job["done_chunks"]) == ("cancelled", 0)
+    assert jobs.cancel(conn, "missing") is None
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_duplicate_finish_counts_once(conn):
+    job_id = jobs.submit(conn, "analyze", [ITEM] * 3, chunk_size=1)
+    first = jobs._claim(conn)
+    # The first worker looks dead, so its chunk is re-queued and claimed again
+    conn.execute("UPDATE chunks SET worker = ? WHERE job_id = ? AND idx = 0", (_dead_pid(), job_id))
+    assert jobs.requeue_dead(conn) == 1
+    second = jobs._claim(conn)
+    assert (first["idx"], second["idx"]) == (0, 0)
+    jobs._finish(conn, job_id, 0, output=[[50.0, 90.0]])
+    jobs._finish(conn, job_id, 0, output=[[50.0, 90.0]])
+    row = jobs._claim(conn)
+    jobs._finish(conn, job_id, row["idx"], output=[[50.0, 90.0]])
+    job = jobs.status(conn, job_id)
+    assert (job["status"], job["done_chunks"]) == ("running", 2)
+    assert conn.execute("SELECT status FROM chunks WHERE job_id = ? AND idx = 2", (job_id,)).fetchone()[0] == "queued"
+
+
+def test_requeue_keeps_live_leases(conn):
+    jobs.submit(conn, "analyze", [ITEM] * 2, chunk_size=1)
+    jobs._claim(conn)
+    assert jobs.requeue_dead(conn) == 0
+    assert conn.execute("SELECT worker FROM chunks WHERE status = 'running'").fetchone()[0] == os.getpid()
+
+
+def test_claim_skips_inactive_jobs(conn):
+    job_id = jobs.submit(conn, "analyze", [ITEM] * 2, chunk_size=1)
+    jobs.cancel(conn, job_id)
+    conn.execute("UPDATE chunks SET status = 'queued' WHERE job_id = ?", (job_id,))
+    assert jobs._claim(conn) is None
+
+
+def _children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+@pytest.mark.skipif(not os.path.exists(f"/proc/{os.getpid()}/task/{os.getpid()}/children"),
+                    reason="needs /proc/<pid>/task/<pid>/children")
+def test_sigterm_stops_workers(tmp_path):
+    pool = multiprocessing.Process(target=jobs.run_pool, args=(str(tmp_path / "jobs.sqlite3"), 2))
+    pool.start()
+    deadline = time.time() + 10
+    while len(_children(pool.pid)) < 2 and time.time() < deadline:
+        time.sleep(0.05)
+    workers = _children(pool.pid)
+    assert len(workers) == 2
+    os.kill(pool.pid, signal.SIGTERM)
+    pool.join(10)
+    assert pool.exitcode is not None
+    assert not any(jobs._alive(pid) for pid in workers)
+
+
+@pytest.mark.parametrize("chunk_size", [0, -1, jobs.MAX_CHUNK_SIZE + 1])
+def test_submit_rejects_chunk_size(conn, chunk_size):
+    with pytest.raises(ValueError):
+        jobs.submit(conn, "analyze", [ITEM], chunk_size=chunk_size)
+
+
+def test_status_without_chunks(conn):
+    conn.execute("INSERT INTO jobs (id, mode, status, items, chunks, created) VALUES ('x', 'analyze', 'done', 0, 0, 0)")
+    assert jobs.status(conn, "x")["progress"] == 1.0
+
+
+def test_cleanup(conn):
+    old = jobs.submit(conn, "analyze", [ITEM])
+    new = jobs.submit(conn, "analyze", [ITEM])
+    _run_all(conn)
+    conn.execute("UPDATE jobs SET finished = ? WHERE id = ?", (time.time() - 7200, old))
+    assert jobs.cleanup(conn, keep=3600) == 1
+    assert jobs.status(conn, old) is None
+    assert conn.execute("SELECT COUNT(*) FROM chunks WHERE job_id = ?", (old,)).fetchone()[0] == 0
+    assert jobs.status(conn, new)["status"] == "done"
+
+
+@pytest.fixture
+def client(tmp_path):
+    app.config["JOBS_DB"] = str(tmp_path / "jobs.sqlite3")
+    yield app.test_client()
+    app.config.pop("JOBS_DB")
+
+
+BASE = {"formula": "Hammerstad and Jensen", "er": 4.4, "h": 1.6, "freq": 2.4, "width_mm": 3, "length_mm": 30}
+
+
+@pytest.mark.parametrize("payload", [
+    {"items": [BASE], "chunk_size": 0},
+    {"sweep": {"base": BASE, "param": "width_mm", "start": 1, "stop": 2, "points": jobs.MAX_ITEMS + 1}},
+    {"tolerance": {"base": BASE, "sigma": {"er": 0.1}, "samples": 10 ** 9}},
+    {"sweep": {"base": BASE, "param": "width_mm", "start": 0, "stop": 2, "points": 3}},
+])
+def test_job_endpoint_400(client, payload):
+    r = client.post("/jobs", json=dict(payload, mode="analyze"))
+    assert r.status_code == 400
+
+
+def test_job_endpoint_roundtrip(client):
+    r = client.post("/jobs", json={"mode": "analyze", "chunk_size": 2,
+                                   "sweep": {"base": BASE, "param": "width_mm", "start": 1, "stop": 3, "points": 3}})
+    assert r.status_code == 202
+    job_id = r.get_json()["id"]
+    assert client.get(f"/jobs/{job_id}/results/0").status_code == 404
+    conn = jobs.connect(app.config["JOBS_DB"])
+    _run_all(conn)
+    conn.close()
+    assert client.get(f"/jobs/{job_id}").get_json()["status"] == "done"
+    body = client.get(f"/jobs/{job_id}/results/1").get_json()
+    assert body["chunks"] == 2 and len(body["results"]) == 1
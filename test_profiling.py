@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from profiling import RequestProfiler, _summarize
+
+
+def _app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    barrier = threading.Barrier(3)
+
+    @app.route("/slow")
+    def slow():
+        barrier.wait(timeout=5)
+        time.sleep(0.05)
+        return "ok"
+
+    return app, RequestProfiler(app)
+
+
+def _concurrent(app, n=3):
+    statuses = []
+    threads = [threading.Thread(target=lambda: statuses.append(app.test_client().get("/slow").status_code))
+               for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return statuses
+
+
+def test_cprofile_captures_one_request_at_a_time():
+    app, profiler = _app(PROFILE_MODE="cprofile", PROFILE_THRESHOLD_MS=0)
+    assert _concurrent(app) == [200, 200, 200]
+    assert len(profiler.profiles) == 1
+    assert not profiler._cprofile_lock.locked()
+    assert app.test_client().get("/missing").status_code == 404
+    assert len(profiler.profiles) == 2
+
+
+def test_sampling_starts_one_sampler():
+    app, profiler = _app(PROFILE_THRESHOLD_MS=0)
+    before = {t for t in threading.enumerate() if t.name == "request-profiler"}
+    assert _concurrent(app) == [200, 200, 200]
+    assert len(profiler.profiles) == 3
+    started = {t for t in threading.enumerate() if t.name == "request-profiler"} - before
+    assert started == {profiler._sampler}
+
+
+@pytest.mark.parametrize("token, status", [(None, 404), ("secret", 403)])
+def test_admin_requires_token(token, status):
+    app, _ = _app(PROFILE_THRESHOLD_MS=0, PROFILE_TOKEN=token)
+    assert app.test_client().get("/admin/profiles").status_code == status
+
+
+def test_summarize():
+    assert _summarize({"items": list(range(1000)), "x": 1}, 2000) == {"items": {"len": 1000, "head": [0, 1, 2]}, "x": 1}
+    assert _summarize({"s": "a" * 5000}, 50) == {"truncated": '{"s": "' + "a" * 43}